@@ -1,5 +1,7 @@
 #include <chrono>
+#include <cmath>
 #include <cstdint>
+#include <cstring>
 #include <iostream>
 #include <memory>
 #include <mutex>
@@ -218,6 +220,7 @@ void VectorDBServer::handleHealth(const httplib::Request& /*req*/, httplib::Resp
   response["recovery_in_progress"]  = db->isRecovering();
   response["dimensions"]            = dimensions;
   response["total_vectors"]         = db->getAllVectors().size();
+  response["features"]              = json::array({"search_repeat", "vector_b64"});
   response["timestamp"]             = std::chrono::duration_cast<std::chrono::milliseconds>(
                                         std::chrono::system_clock::now().time_since_epoch()).count();
 
@@ -259,7 +262,7 @@ void VectorDBServer::handlePostVectors(const httplib::Request& req, httplib::Res
   total_requests++;
   try {
     auto body = json::parse(req.body);
-    if (!body.contains("key") || !body.contains("vector")) {
+    if (!body.contains("key") || (!body.contains("vector") && !body.contains("vector_b64"))) {
       handleError(res, 400, "Missing required fields: key, vector");
       failed_requests++;
       logRequest("POST", "/vectors", 400);
@@ -269,14 +272,18 @@ void VectorDBServer::handlePostVectors(const httplib::Request& req, httplib::Res
     std::string key      = body["key"];
     std::string metadata = body.value("metadata", "");
 
-    if (!validateVector(body["vector"], dimensions)) {
+    std::vector<float> data;
+    bool valid = body.contains("vector_b64")
+        ? decodeFloat32Base64(body["vector_b64"].get<std::string>(), data) && data.size() == dimensions
+        : validateVector(body["vector"], dimensions);
+    if (!valid) {
       handleError(res, 400, "Invalid vector format or dimensions");
       failed_requests++;
       logRequest("POST", "/vectors", 400);
       return;
     }
 
-    std::vector<float> data = body["vector"];
+    if (!body.contains("vector_b64")) data = body["vector"].get<std::vector<float>>();
     Vector v(data);
 
     std::lock_guard<std::mutex> lock(db_mutex);
@@ -285,6 +292,7 @@ void VectorDBServer::handlePostVectors(const httplib::Request& req, httplib::Res
       r["success"] = true;
       r["key"]     = key;
       r["message"] = "Vector inserted successfully";
+      addCacheStats(r);
       res.set_content(r.dump(), "application/json");
       successful_requests++;
       logRequest("POST", "/vectors", 200);
@@ -385,6 +393,7 @@ void VectorDBServer::handleDeleteVector(const httplib::Request& req, httplib::Re
       r["success"] = true;
       r["key"]     = key;
       r["message"] = "Vector deleted successfully";
+      addCacheStats(r);
       res.set_content(r.dump(), "application/json");
       successful_requests++;
       logRequest("DELETE", "/vectors/" + key, 200);
@@ -404,24 +413,44 @@ void VectorDBServer::handleSearch(const httplib::Request& req, httplib::Response
   total_requests++;
   try {
     auto body = json::parse(req.body);
-    if (!body.contains("query") || !body.contains("k")) {
+    if ((!body.contains("query") && !body.contains("query_b64")) || !body.contains("k")) {
       handleError(res, 400, "Missing required fields: query, k");
       failed_requests++;
       logRequest("POST", "/search", 400);
       return;
     }
-    if (!validateVector(body["query"], dimensions)) {
+
+    std::vector<float> q;
+    bool valid = body.contains("query_b64")
+        ? decodeFloat32Base64(body["query_b64"].get<std::string>(), q) && q.size() == dimensions
+        : validateVector(body["query"], dimensions);
+    if (!valid) {
       handleError(res, 400, "Invalid query vector format or dimensions");
       failed_requests++;
       logRequest("POST", "/search", 400);
       return;
     }
 
-    std::vector<float> q = body["query"];
+    if (!body.contains("query_b64")) q = body["query"].get<std::vector<float>>();
     Vector query(q);
     size_t k = body["k"];
     bool include_metadata = body.value("include_metadata", false);
 
+    // Optional: run the same search several times and report server-side timing.
+    // The runs hold db_mutex, so the cap keeps one request from stalling the server
+    // Range-checked as int64_t before narrowing, so huge or fractional values can't wrap into range
+    int64_t requested_repeat = 1;
+    if (body.contains("repeat")) {
+      requested_repeat = body["repeat"].is_number_integer() ? body["repeat"].get<int64_t>() : 0;
+    }
+    if (requested_repeat < 1 || requested_repeat > 1000) {
+      handleError(res, 400, "repeat must be an integer between 1 and 1000");
+      failed_requests++;
+      logRequest("POST", "/search", 400);
+      return;
+    }
+    int repeat = static_cast<int>(requested_repeat);
+
     std::lock_guard<std::mutex> lock(db_mutex);
 
     json response;
@@ -429,8 +458,10 @@ void VectorDBServer::handleSearch(const httplib::Request& req, httplib::Response
     response["k"]       = k;
     response["results"] = json::array();
 
+    auto start = std::chrono::steady_clock::now();
     if (include_metadata) {
-      auto results = db->similaritySearchWithMetadata(query, k);
+      std::vector<VectorDatabase::SearchResult> results;
+      for (int i = 0; i < repeat; ++i) results = db->similaritySearchWithMetadata(query, k);
       for (const auto& r : results) {
         json item;
         item["key"]       = r.key;
@@ -439,7 +470,8 @@ void VectorDBServer::handleSearch(const httplib::Request& req, httplib::Response
         response["results"].push_back(item);
       }
     } else {
-      auto results = db->similaritySearch(query, k);
+      std::vector<std::pair<std::string, float>> results;
+      for (int i = 0; i < repeat; ++i) results = db->similaritySearch(query, k);
       for (const auto& [key, dist] : results) {
         json item;
         item["key"]      = key;
@@ -447,7 +479,18 @@ void VectorDBServer::handleSearch(const httplib::Request& req, httplib::Response
         response["results"].push_back(item);
       }
     }
+    auto elapsed_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(
+                        std::chrono::steady_clock::now() - start).count();
     response["count"] = response["results"].size();
+    addCacheStats(response);
+
+    if (body.contains("repeat")) {
+      response["timing"] = {
+        {"repeat",       repeat},
+        {"total_ns",     elapsed_ns},
+        {"per_query_ns", elapsed_ns / repeat}
+      };
+    }
 
     res.set_content(response.dump(), "application/json");
     successful_requests++;
@@ -518,27 +561,44 @@ void VectorDBServer::handleBatchInsert(const httplib::Request& req, httplib::Res
   total_batch_operations++;
   try {
     auto body = json::parse(req.body);
-    if (!body.contains("keys") || !body.contains("vectors")) {
+    if (!body.contains("keys") || (!body.contains("vectors") && !body.contains("vectors_b64"))) {
       handleError(res, 400, "Missing required fields: keys, vectors");
       failed_requests++;
       logRequest("POST", "/vectors/batch/insert", 400);
       return;
     }
-    if (!validateBatchRequest(body)) {
-      handleError(res, 400, "Invalid batch request format");
-      failed_requests++;
-      logRequest("POST", "/vectors/batch/insert", 400);
-      return;
+
+    std::vector<Vector> vectors;
+    if (body.contains("vectors_b64")) {
+      // One base64 blob holding all rows back to back (row-major float32)
+      std::vector<float> flat;
+      if (!body["keys"].is_array() ||
+          !decodeFloat32Base64(body["vectors_b64"].get<std::string>(), flat) ||
+          flat.size() != body["keys"].size() * dimensions) {
+        handleError(res, 400, "Invalid batch request format");
+        failed_requests++;
+        logRequest("POST", "/vectors/batch/insert", 400);
+        return;
+      }
+      vectors.reserve(body["keys"].size());
+      for (size_t offset = 0; offset < flat.size(); offset += dimensions) {
+        vectors.emplace_back(std::vector<float>(flat.begin() + offset, flat.begin() + offset + dimensions));
+      }
+    } else {
+      if (!validateBatchRequest(body)) {
+        handleError(res, 400, "Invalid batch request format");
+        failed_requests++;
+        logRequest("POST", "/vectors/batch/insert", 400);
+        return;
+      }
+      for (const auto& vj : body["vectors"]) {
+        std::vector<float> vf = vj;
+        vectors.emplace_back(vf);
+      }
     }
 
     std::vector<std::string> keys     = body["keys"];
     std::vector<std::string> metadata = body.value("metadata", std::vector<std::string>{});
-    std::vector<Vector> vectors;
-
-    for (const auto& vj : body["vectors"]) {
-      std::vector<float> vf = vj;
-      vectors.emplace_back(vf);
-    }
 
     std::lock_guard<std::mutex> lock(db_mutex);
     auto batch_result = db->batchInsert(keys, vectors, metadata);
@@ -955,6 +1015,19 @@ void VectorDBServer::handleSuccess(httplib::Response& res, const json& data) {
   res.set_content(r.dump(), "application/json");
 }
 
+void VectorDBServer::addCacheStats(json& response) {
+  QueryCache::Statistics stats;
+  if (!db->getCacheStatistics(stats)) return;
+
+  response["cache_stats"] = {
+      {"hits", stats.hits},
+      {"misses", stats.misses},
+      {"current_size", stats.current_size},
+      {"capacity", stats.capacity},
+      {"hit_rate", stats.hit_rate()}
+  };
+}
+
 void VectorDBServer::recoveryMonitorFunction() {
   while (!should_stop_monitoring) {
     try {
@@ -1001,6 +1074,49 @@ bool VectorDBServer::validateBatchRequest(const json& body) {
   return true;
 }
 
+bool VectorDBServer::decodeFloat32Base64(const std::string& encoded, std::vector<float>& out) {
+  // Padded base64 only: whole quartets, and at most two '=' which must end the input
+  if (encoded.size() % 4 != 0) return false;
+  size_t data_len = encoded.find('=');
+  if (data_len == std::string::npos) data_len = encoded.size();
+  if (encoded.size() - data_len > 2 ||
+      encoded.find_first_not_of('=', data_len) != std::string::npos) {
+    return false;
+  }
+
+  std::string bytes;
+  bytes.reserve(encoded.size() / 4 * 3);
+
+  uint32_t buffer = 0;
+  int bits = 0;
+  for (char c : encoded.substr(0, data_len)) {
+    uint32_t value;
+    if (c >= 'A' && c <= 'Z')      value = c - 'A';
+    else if (c >= 'a' && c <= 'z') value = c - 'a' + 26;
+    else if (c >= '0' && c <= '9') value = c - '0' + 52;
+    else if (c == '+')             value = 62;
+    else if (c == '/')             value = 63;
+    else                           return false;
+
+    buffer = ((buffer << 6) | value) & 0xFFFFFF;
+    bits += 6;
+    if (bits >= 8) {
+      bits -= 8;
+      bytes.push_back(static_cast<char>((buffer >> bits) & 0xFF));
+    }
+  }
+  if (bytes.size() % sizeof(float) != 0) return false;
+
+  out.resize(bytes.size() / sizeof(float));
+  std::memcpy(out.data(), bytes.data(), bytes.size());
+
+  // JSON arrays can't carry NaN/Inf, so the binary form must not either
+  for (float f : out) {
+    if (!std::isfinite(f)) return false;
+  }
+  return true;
+}
+
 void VectorDBServer::start(bool blocking) {
   std::cout << "Starting Vector Database Server on " << host << ":" << port << std::endl;
   db->initialize();
@@ -1265,9 +1381,9 @@ void VectorDBServer::handleSetAlgorithm(const httplib::Request& req, httplib::Re
     
     std::lock_guard<std::mutex> lock(db_mutex);
     
-    // Get parameters with defaults
-    size_t param1 = 10;  // Default for LSH tables / HNSW M
-    size_t param2 = 8;   // Default for LSH hash functions / HNSW ef_construction
+    // Get parameters with defaults (must match GET /config/algorithm)
+    size_t param1 = 10;  // Default for LSH tables
+    size_t param2 = 8;   // Default for LSH hash functions
     
     if (algorithm == "lsh") {
       if (request.contains("num_tables")) {
@@ -1277,6 +1393,8 @@ void VectorDBServer::handleSetAlgorithm(const httplib::Request& req, httplib::Re
         param2 = request["num_hash_functions"];
       }
     } else if (algorithm == "hnsw") {
+      param1 = 16;   // Default HNSW M
+      param2 = 200;  // Default HNSW ef_construction
       if (request.contains("M")) {
         param1 = request["M"];
       }
@@ -95,6 +95,7 @@ private:
     void logRequest(const std::string& method, const std::string& path, int status_code);
     void handleError(httplib::Response& res, int status_code, const std::string& message);
     void handleSuccess(httplib::Response& res, const nlohmann::json& data = nlohmann::json{});
+    void addCacheStats(nlohmann::json& response);
     
     // Recovery monitoring
     void recoveryMonitorFunction();
@@ -104,6 +105,9 @@ private:
     // Validation
     bool validateVector(const nlohmann::json& vector_json, size_t expected_dimensions);
     bool validateBatchRequest(const nlohmann::json& request_json);
+    // Decode base64 of little-endian float32 values (binary alternative to JSON number arrays);
+    // fails on malformed input and on NaN/Inf values
+    bool decodeFloat32Base64(const std::string& encoded, std::vector<float>& out);
     
 public:
     /**
@@ -162,6 +162,11 @@ void VectorDatabase::setDistanceMetric(std::shared_ptr<DistanceMetric> metric) {
         if (lsh_index)  lsh_index->insert(vector, key);
         if (hnsw_index) hnsw_index->insert(vector, key);
     }
+
+    // Invalidate query cache since cached distances used the old metric
+    if (query_cache) {
+        query_cache->clear();
+    }
 }
 
 void VectorDatabase::setApproximateAlgorithm(const std::string& algorithm, size_t param1, size_t param2) {
@@ -182,6 +187,11 @@ void VectorDatabase::setApproximateAlgorithm(const std::string& algorithm, size_
         if (lsh_index)  lsh_index->insert(vector, key);
         if (hnsw_index) hnsw_index->insert(vector, key);
     }
+
+    // Invalidate query cache since cached results came from the old index
+    if (query_cache) {
+        query_cache->clear();
+    }
 }
 
 // -------------------- mutations (with auto-checkpoint) --------------------
@@ -490,6 +500,14 @@ AtomicBatchInsert::BatchResult VectorDatabase::batchInsert(const std::vector<std
         total_inserts.fetch_add(result.operations_committed);
     }
     
+    // Invalidate query cache once for the whole batch since data changed
+    if (result.operations_committed > 0) {
+        if (query_cache) {
+            query_cache->clear();
+        }
+        markGPUBufferDirty();
+    }
+    
     // Check if we need to checkpoint after batch
     if (result.success && persistence_manager) {
         if (persistence_manager->shouldCheckpoint()) {
@@ -569,6 +587,14 @@ AtomicBatchInsert::BatchResult VectorDatabase::batchUpdate(const std::vector<std
         total_updates.fetch_add(result.operations_committed);
     }
     
+    // Invalidate query cache once for the whole batch since data changed
+    if (result.operations_committed > 0) {
+        if (query_cache) {
+            query_cache->clear();
+        }
+        markGPUBufferDirty();
+    }
+    
     // Check if we need to checkpoint after batch
     if (result.success && persistence_manager) {
         if (persistence_manager->shouldCheckpoint()) {
@@ -624,6 +650,14 @@ AtomicBatchInsert::BatchResult VectorDatabase::batchDelete(const std::vector<std
         total_deletes.fetch_add(result.operations_committed);
     }
     
+    // Invalidate query cache once for the whole batch since data changed
+    if (result.operations_committed > 0) {
+        if (query_cache) {
+            query_cache->clear();
+        }
+        markGPUBufferDirty();
+    }
+    
     // Check if we need to checkpoint after batch
     if (result.success && persistence_manager) {
         if (persistence_manager->shouldCheckpoint()) {
@@ -684,6 +718,14 @@ VectorDatabase::DatabaseStatistics VectorDatabase::getStatistics() const {
     return stats;
 }
 
+bool VectorDatabase::getCacheStatistics(QueryCache::Statistics& stats) const {
+    std::lock_guard<std::mutex> lock(db_mutex);
+
+    if (!query_cache) return false;
+    stats = query_cache->getStatistics();
+    return true;
+}
+
 // -------------------- state helpers --------------------
 
 bool VectorDatabase::isReady() const {
@@ -150,6 +150,9 @@ public:
 
     DatabaseStatistics getStatistics() const;
 
+    // Query cache counters only; returns false when the cache is disabled
+    bool getCacheStatistics(QueryCache::Statistics& stats) const;
+
     const PersistenceConfig& getPersistenceConfig() const;
 
     bool isReady() const;
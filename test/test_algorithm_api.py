@@ -9,416 +9,504 @@ Tests:
 4. Switch back to exact
 5. Verify search performance differences
 6. Test error handling (invalid algorithms)
+
+Run with pytest (pytest-xdist optional):
+    pytest test/test_algorithm_api.py -n auto --tb=short -m "not slow"
+    pytest test/test_algorithm_api.py -m slow   # performance comparison + HNSW sweep
+
+The slow benchmark switches the server-wide algorithm repeatedly, so run it
+on its own rather than alongside other workers.
+
+The benchmark workload can be set from the environment (running this file
+directly sets these from its command-line flags, see --help):
+    VDB_NUM_VECTORS  vectors inserted for the performance comparison (default: 5000)
+    VDB_DIM          vector dimensions, must match the server (default: 128)
+    VDB_NUM_QUERIES  timed searches per algorithm, at least 2 (default: 100)
+    VDB_BATCH        vectors per batch insert (default: 1000)
+    VDB_ALGORITHMS   comma-separated algorithms to compare (default: exact,lsh,hnsw)
+    VDB_SEQUENTIAL   set to 1 to time searches one at a time
+    VDB_NO_SWEEP     set to 1 to skip the HNSW parameter sweep
 """
 
+import pytest
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import time
-import random
 import sys
+import argparse
+import csv
+import logging
+import os
+import re
+import socket
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Only the slow benchmark needs these; the API tests run without them
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 BASE_URL = "http://localhost:8080"
 
-def print_test(name):
-    """Print test name"""
-    print(f"\n{'='*60}")
-    print(f"TEST: {name}")
-    print('='*60)
+# Shared keep-alive session: every call reuses pooled connections instead of
+# opening a new socket per request
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
+SESSION.headers["Content-Type"] = "application/json"
+
+ALGORITHM_PARAMS = {
+    "exact": {},
+    "lsh": {"num_tables": 10, "num_hash_functions": 8},
+    "hnsw": {"M": 16, "ef_construction": 200},
+}
+
+def _env_int(name, default, minimum=1):
+    """Read an integer workload setting from the environment"""
+    value = int(os.environ.get(name, default))
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, got {value}")
+    return value
+
+def _env_algorithms(name, default):
+    """Read a comma-separated algorithm list from the environment"""
+    algorithms = [a.strip() for a in os.environ.get(name, default).split(",") if a.strip()]
+    unknown = [a for a in algorithms if a not in ALGORITHM_PARAMS]
+    if unknown:
+        raise ValueError(f"{name}: unknown algorithm(s): {', '.join(unknown)}")
+    return algorithms
+
+# Performance comparison workload; read from the environment (see the module
+# docstring) so pytest-xdist workers see the same settings as the controller
+NUM_VECTORS = _env_int("VDB_NUM_VECTORS", 5000)
+DIMENSIONS = _env_int("VDB_DIM", 128)
+NUM_SEARCHES = _env_int("VDB_NUM_QUERIES", 100, minimum=2)  # quantiles need two samples
+BATCH_SIZE = _env_int("VDB_BATCH", 1000)
+BENCH_ALGORITHMS = _env_algorithms("VDB_ALGORITHMS", "exact,lsh,hnsw")
+
+# Search benchmark concurrency; set VDB_SEQUENTIAL=1 to measure isolated
+# per-request latency instead of throughput under load
+SEARCH_WORKERS = 16
+CONCURRENT_SEARCHES = os.environ.get("VDB_SEQUENTIAL") != "1"
+
+# Number of batch inserts in flight at once
+INSERT_WORKERS = 4
 
-def print_pass(message):
-    """Print success message"""
-    print(f"[PASS] PASS: {message}")
+# HNSW parameter sweep grid; results are written to SWEEP_CSV
+RUN_HNSW_SWEEP = os.environ.get("VDB_NO_SWEEP") != "1"
+HNSW_SWEEP_M = [8, 12, 16, 32]
+HNSW_SWEEP_EF_CONSTRUCTION = [100, 200, 400]
+SWEEP_QUERIES = 50
+SWEEP_CSV = "sweep.csv"
+
+# Seeded generator so every run exercises the same corpus
+_RNG = np.random.default_rng(0) if np is not None else None
+
+log = logging.getLogger("algotest")
 
 def print_fail(message):
     """Print failure message"""
-    print(f"[FAIL] FAIL: {message}")
+    log.error(f"[FAIL] FAIL: {message}")
     
 def print_info(message):
     """Print info message"""
-    print(f"ℹ️  INFO: {message}")
+    log.info(f"ℹ️  INFO: {message}")
 
-def generate_random_vector(dims=128):
-    """Generate random vector"""
-    return [random.random() for _ in range(dims)]
+@contextmanager
+def quiet_logging():
+    """Suppress INFO output so timed regions measure the server, not the terminal"""
+    level = log.level
+    log.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        log.setLevel(level)
 
-def test_get_algorithm_info():
-    """Test getting algorithm information"""
-    print_test("Get Algorithm Information")
-    
-    response = requests.get(f"{BASE_URL}/config/algorithm")
-    
-    if response.status_code != 200:
-        print_fail(f"Status code: {response.status_code}")
-        return False
-    
-    data = response.json()
-    print_info(f"Current algorithm: {data['current_algorithm']}")
-    print_info(f"Available algorithms: {len(data['available_algorithms'])}")
-    
-    # Verify structure
-    if 'current_algorithm' not in data:
-        print_fail("Missing 'current_algorithm'")
-        return False
-    
-    if 'available_algorithms' not in data:
-        print_fail("Missing 'available_algorithms'")
+def documented_defaults(meta, algorithm):
+    """Parse the '(default: N)' values advertised for an algorithm's parameters"""
+    for algo in meta['available_algorithms']:
+        if algo['name'] != algorithm:
+            continue
+        defaults = {}
+        for name, description in algo.get('parameters', {}).items():
+            match = re.search(r"default: (\d+)", description)
+            if match:
+                defaults[name] = int(match.group(1))
+        return defaults
+    return {}
+
+def put_algorithm(request_data):
+    """Switch the search algorithm and return the decoded response"""
+    response = SESSION.put(f"{BASE_URL}/config/algorithm", json=request_data)
+    assert response.status_code == 200, f"Status code: {response.status_code}, response: {response.text}"
+    return response.json()
+
+def check_server():
+    """Check if server is running (plain TCP connect, no HTTP round trip)"""
+    url = urlparse(BASE_URL)
+    try:
+        socket.create_connection((url.hostname, url.port), timeout=0.5).close()
+        return True
+    except OSError:
         return False
+
+def search_keys(query, k=10):
+    """Run one search and return (result keys, latency in seconds)"""
+    t = time.perf_counter()
+    response = SESSION.post(f"{BASE_URL}/search", json={"query": query, "k": k})
+    elapsed = time.perf_counter() - t
+    response.raise_for_status()
+    return [r['key'] for r in response.json()['results']], elapsed
+
+def brute_force_neighbors(queries, k=10):
+    """Exact top-k keys per query, computed client-side over everything GET /vectors returns
+
+    The server's "exact" algorithm goes through the KD-tree, which is itself
+    approximate, so it can't serve as ground truth for recall.
+    """
+    response = SESSION.get(f"{BASE_URL}/vectors")
+    response.raise_for_status()
+    rows = response.json()['vectors']
+    keys = [r['key'] for r in rows]
+    corpus = np.array([r['vector'] for r in rows], dtype=np.float32)
+    
+    response = SESSION.get(f"{BASE_URL}/config/distance-metric")
+    response.raise_for_status()
+    metric = response.json()['current_metric']
+    
+    queries = np.asarray(queries, dtype=np.float32)
+    if metric == "cosine":
+        unit = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        dist = -(queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T
+    elif metric == "manhattan":
+        dist = np.stack([np.abs(corpus - q).sum(axis=1) for q in queries])
+    else:  # euclidean; squared distance ranks the same
+        dist = (corpus ** 2).sum(axis=1) - 2 * queries @ corpus.T
+    nearest = np.argsort(dist, axis=1)[:, :k]
+    return [{keys[i] for i in row} for row in nearest]
+
+def run_hnsw_sweep(k=10):
+    """Sweep HNSW (M, ef_construction) and record recall@k against latency"""
+    query_array = _RNG.random((SWEEP_QUERIES, DIMENSIONS), dtype=np.float32)
+    queries = query_array.tolist()
+    truth = brute_force_neighbors(query_array, k)
+    
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        run = pool.map if CONCURRENT_SEARCHES else map
+        
+        rows = []
+        for M in HNSW_SWEEP_M:
+            for ef_c in HNSW_SWEEP_EF_CONSTRUCTION:
+                request_data = {"algorithm": "hnsw", "M": M, "ef_construction": ef_c}
+                response = SESSION.put(f"{BASE_URL}/config/algorithm", json=request_data)
+                if response.status_code != 200:
+                    print_fail(f"Failed to configure HNSW M={M}, ef_construction={ef_c}")
+                    continue
+                
+                with quiet_logging():
+                    start = time.perf_counter()
+                    searches = list(run(lambda q: search_keys(q, k), queries))
+                    elapsed = time.perf_counter() - start
+                
+                latencies = [lat * 1000 for _, lat in searches]  # ms
+                cuts = statistics.quantiles(latencies, n=100)
+                hits = sum(len(set(keys) & t) for (keys, _), t in zip(searches, truth))
+                row = {
+                    "algo": "hnsw",
+                    "M": M,
+                    "ef_c": ef_c,
+                    "ef_search": ef_c,  # server builds HNSW with ef_search = ef_construction
+                    "lat_ms_p50": round(cuts[49], 3),
+                    "lat_ms_p99": round(cuts[98], 3),
+                    "recall10": round(hits / (k * len(queries)), 4),
+                    "qps": round(len(queries) / elapsed, 1),
+                }
+                rows.append(row)
+                print_info(f"  M={M:<3} ef_c={ef_c:<4} recall@{k}={row['recall10']:.3f} "
+                           f"p50={row['lat_ms_p50']:.2f}ms p99={row['lat_ms_p99']:.2f}ms qps={row['qps']:.0f}")
+    
+    with open(SWEEP_CSV, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["algo"])
+        writer.writeheader()
+        writer.writerows(rows)
+    print_info(f"Sweep results written to {SWEEP_CSV}")
+    assert rows, "No HNSW configuration could be applied"
+
+# Skip the whole module when no server is listening. A mark rather than
+# setup_module, which pytest runs only after session fixtures like algo_meta
+pytestmark = pytest.mark.skipif(
+    not check_server(),
+    reason=f"Cannot connect to server at {BASE_URL}. Start it with: ./build/vector_db_server",
+)
+
+@pytest.fixture(scope="session")
+def algo_meta():
+    """GET /config/algorithm, fetched once per session and shared by the tests"""
+    response = SESSION.get(f"{BASE_URL}/config/algorithm")
+    response.raise_for_status()
+    return response.json()
+
+def test_get_algorithm_info(algo_meta):
+    """Test getting algorithm information"""
+    assert 'current_algorithm' in algo_meta
+    assert 'available_algorithms' in algo_meta
+    print_info(f"Current algorithm: {algo_meta['current_algorithm']}")
     
-    # Check each algorithm
-    algorithms = data['available_algorithms']
     expected_algorithms = ['exact', 'lsh', 'hnsw']
-    
-    for algo in algorithms:
+    for algo in algo_meta['available_algorithms']:
         name = algo['name']
-        print_info(f"\n  {name.upper()}:")
-        print_info(f"    - Description: {algo['description']}")
-        print_info(f"    - Accuracy: {algo['accuracy']}")
-        print_info(f"    - Speed: {algo['speed']}")
-        print_info(f"    - Memory: {algo['memory']}")
-        print_info(f"    - Use case: {algo['use_case']}")
-        
-        if name not in expected_algorithms:
-            print_fail(f"Unexpected algorithm: {name}")
-            return False
-    
-    print_pass("Algorithm information retrieved successfully")
-    return True
+        print_info(f"{name.upper()}: {algo['description']} "
+                   f"(accuracy: {algo['accuracy']}, speed: {algo['speed']}, "
+                   f"memory: {algo['memory']}, use case: {algo['use_case']})")
+        assert name in expected_algorithms, f"Unexpected algorithm: {name}"
 
 def test_switch_to_lsh():
     """Test switching to LSH algorithm"""
-    print_test("Switch to LSH Algorithm")
-    
-    request_data = {
+    data = put_algorithm({
         "algorithm": "lsh",
         "num_tables": 15,
         "num_hash_functions": 10
-    }
-    
-    response = requests.put(
-        f"{BASE_URL}/config/algorithm",
-        json=request_data
-    )
-    
-    if response.status_code != 200:
-        print_fail(f"Status code: {response.status_code}")
-        print_info(f"Response: {response.text}")
-        return False
-    
-    data = response.json()
-    print_info(f"Response: {json.dumps(data, indent=2)}")
-    
-    if data['algorithm'] != 'lsh':
-        print_fail(f"Expected 'lsh', got '{data['algorithm']}'")
-        return False
+    })
     
-    if data['parameters']['num_tables'] != 15:
-        print_fail(f"Expected 15 tables, got {data['parameters']['num_tables']}")
-        return False
-    
-    if data['parameters']['num_hash_functions'] != 10:
-        print_fail(f"Expected 10 hash functions, got {data['parameters']['num_hash_functions']}")
-        return False
-    
-    print_pass(f"Switched to LSH: {data['expected_performance']}")
-    return True
+    assert data['algorithm'] == 'lsh'
+    assert data['parameters']['num_tables'] == 15
+    assert data['parameters']['num_hash_functions'] == 10
+    print_info(f"Switched to LSH: {data['expected_performance']}")
 
 def test_switch_to_hnsw():
     """Test switching to HNSW algorithm"""
-    print_test("Switch to HNSW Algorithm")
-    
-    request_data = {
+    data = put_algorithm({
         "algorithm": "hnsw",
         "M": 20,
         "ef_construction": 250
-    }
-    
-    response = requests.put(
-        f"{BASE_URL}/config/algorithm",
-        json=request_data
-    )
-    
-    if response.status_code != 200:
-        print_fail(f"Status code: {response.status_code}")
-        print_info(f"Response: {response.text}")
-        return False
-    
-    data = response.json()
-    print_info(f"Response: {json.dumps(data, indent=2)}")
+    })
     
-    if data['algorithm'] != 'hnsw':
-        print_fail(f"Expected 'hnsw', got '{data['algorithm']}'")
-        return False
-    
-    if data['parameters']['M'] != 20:
-        print_fail(f"Expected M=20, got {data['parameters']['M']}")
-        return False
-    
-    if data['parameters']['ef_construction'] != 250:
-        print_fail(f"Expected ef_construction=250, got {data['parameters']['ef_construction']}")
-        return False
-    
-    print_pass(f"Switched to HNSW: {data['expected_performance']}")
-    return True
+    assert data['algorithm'] == 'hnsw'
+    assert data['parameters']['M'] == 20
+    assert data['parameters']['ef_construction'] == 250
+    print_info(f"Switched to HNSW: {data['expected_performance']}")
 
 def test_switch_to_exact():
     """Test switching back to exact search"""
-    print_test("Switch to Exact Search")
+    data = put_algorithm({"algorithm": "exact"})
     
-    request_data = {
-        "algorithm": "exact"
-    }
+    assert data['algorithm'] == 'exact'
+    print_info(f"Switched to exact: {data['expected_performance']}")
+
+def test_default_parameters(algo_meta):
+    """Test switching with default parameters"""
+    # Switch to HNSW without specifying parameters
+    data = put_algorithm({"algorithm": "hnsw"})
+    print_info(f"Default parameters: {data['parameters']}")
     
-    response = requests.put(
+    # Check defaults are applied and match the advertised spec
+    expected = documented_defaults(algo_meta, "hnsw")
+    for name in ('M', 'ef_construction'):
+        assert name in data['parameters'], f"Missing {name} parameter"
+        if name in expected:
+            assert data['parameters'][name] == expected[name], (
+                f"{name} default is {data['parameters'][name]}, "
+                f"but /config/algorithm advertises {expected[name]}")
+
+def test_invalid_algorithm():
+    """Test error handling for invalid algorithm"""
+    response = SESSION.put(
         f"{BASE_URL}/config/algorithm",
-        json=request_data
+        json={"algorithm": "invalid_algo"}
     )
     
-    if response.status_code != 200:
-        print_fail(f"Status code: {response.status_code}")
-        print_info(f"Response: {response.text}")
-        return False
-    
-    data = response.json()
-    print_info(f"Response: {json.dumps(data, indent=2)}")
-    
-    if data['algorithm'] != 'exact':
-        print_fail(f"Expected 'exact', got '{data['algorithm']}'")
-        return False
+    assert response.status_code == 400
+    assert 'error' in response.json()
+
+def test_missing_algorithm_field():
+    """Test error handling for missing algorithm field"""
+    response = SESSION.put(
+        f"{BASE_URL}/config/algorithm",
+        json={"num_tables": 10}  # Missing 'algorithm' field
+    )
     
-    print_pass(f"Switched to exact: {data['expected_performance']}")
-    return True
+    assert response.status_code == 400
+    assert 'error' in response.json()
 
+@pytest.mark.slow
 def test_performance_comparison():
     """Test performance difference between algorithms"""
-    print_test("Performance Comparison Across Algorithms")
+    pytest.importorskip("numpy")
+    pytest.importorskip("orjson")
     
     # Insert test vectors using BATCH INSERT (much faster!)
-    num_vectors = 5000
-    batch_size = 1000
+    num_vectors = NUM_VECTORS
+    batch_size = BATCH_SIZE
     print_info(f"Inserting {num_vectors} test vectors using batch insert (batch_size={batch_size})...")
     
-    start_insert = time.time()
+    # Generate the whole corpus up front; batches below are only slices
+    all_vectors = _RNG.random((num_vectors, DIMENSIONS), dtype=np.float32)
+    all_keys = list(map("perf_test_{}".format, range(num_vectors)))
+    all_metadata = list(map("Performance test vector {}".format, range(num_vectors)))
     
+    batches = []
     for batch_start in range(0, num_vectors, batch_size):
         batch_end = min(batch_start + batch_size, num_vectors)
-        batch_count = batch_end - batch_start
-        
-        # Generate batch data
-        keys = [f"perf_test_{i}" for i in range(batch_start, batch_end)]
-        vectors = [generate_random_vector(128) for _ in range(batch_count)]
-        metadata = [f"Performance test vector {i}" for i in range(batch_start, batch_end)]
-        
-        # Batch insert
-        response = requests.post(
-            f"{BASE_URL}/vectors/batch/insert",
-            json={
+        batches.append((
+            all_keys[batch_start:batch_end],
+            all_vectors[batch_start:batch_end],
+            all_metadata[batch_start:batch_end],
+        ))
+    
+    def post_batch(batch):
+        """Insert one batch (orjson serializes the float32 rows directly)"""
+        keys, vectors, metadata = batch
+        body = orjson.dumps(
+            {
                 "keys": keys,
                 "vectors": vectors,
                 "metadata": metadata
-            }
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY
         )
-        
-        if response.status_code != 200:
-            print_fail(f"Batch insert failed: {response.text}")
-            return False
-        
-        print_info(f"  Inserted {batch_end}/{num_vectors} vectors")
+        return SESSION.post(f"{BASE_URL}/vectors/batch/insert", data=body)
+    
+    # Batches go out concurrently so server-side indexing overlaps with
+    # serialization and transfer of the next batch
+    with quiet_logging(), ThreadPoolExecutor(max_workers=INSERT_WORKERS) as pool:
+        start_insert = time.perf_counter()
+        responses = list(pool.map(post_batch, batches))
+        insert_time = time.perf_counter() - start_insert
+    
+    inserted = 0
+    for (keys, _, _), response in zip(batches, responses):
+        assert response.status_code == 200, f"Batch insert failed: {response.text}"
+        inserted += len(keys)
+        print_info(f"  Inserted {inserted}/{num_vectors} vectors")
     
-    insert_time = time.time() - start_insert
     print_info(f"Vectors inserted successfully in {insert_time:.2f}s ({num_vectors/insert_time:.0f} vectors/sec)")
     
-    query_vector = generate_random_vector(128)
-    num_searches = 100
+    num_searches = NUM_SEARCHES
     
-    algorithms = [
-        ("exact", {}),
-        ("lsh", {"num_tables": 10, "num_hash_functions": 8}),
-        ("hnsw", {"M": 16, "ef_construction": 200})
-    ]
+    # Distinct queries, serialized once and shared by every algorithm. No
+    # query repeats, so no timed search is answered from the query cache
+    # (which is cleared on every algorithm switch)
+    warmup_count = SEARCH_WORKERS if CONCURRENT_SEARCHES else 5
+    queries = _RNG.random((warmup_count + num_searches, DIMENSIONS), dtype=np.float32)
+    payloads = [orjson.dumps({"query": q, "k": 10}, option=orjson.OPT_SERIALIZE_NUMPY) for q in queries]
+    warmup_payloads, timed_payloads = payloads[:warmup_count], payloads[warmup_count:]
     
-    results = {}
+    def timed_search(body):
+        """Issue one search and return its latency in seconds; raises on a non-2xx status"""
+        t = time.perf_counter()
+        response = SESSION.post(f"{BASE_URL}/search", data=body)
+        latency = time.perf_counter() - t
+        response.raise_for_status()
+        return latency
     
-    for algo_name, params in algorithms:
-        print_info(f"\nTesting {algo_name.upper()}...")
-        
-        # Switch algorithm
-        request_data = {"algorithm": algo_name, **params}
-        response = requests.put(f"{BASE_URL}/config/algorithm", json=request_data)
-        
-        if response.status_code != 200:
-            print_fail(f"Failed to switch to {algo_name}")
-            continue
-        
-        # Warm up
-        for _ in range(5):
-            requests.post(f"{BASE_URL}/search", json={"vector": query_vector, "k": 10})
-        
-        # Time searches
-        start = time.time()
-        for _ in range(num_searches):
-            requests.post(f"{BASE_URL}/search", json={"vector": query_vector, "k": 10})
-        elapsed = time.time() - start
-        
-        avg_latency = (elapsed / num_searches) * 1000  # ms
-        results[algo_name] = avg_latency
-        
-        print_info(f"  Average latency: {avg_latency:.2f}ms")
+    algorithms = [(name, ALGORITHM_PARAMS[name]) for name in BENCH_ALGORITHMS]
+    
+    results = {}
+    mode = f"{SEARCH_WORKERS} concurrent workers" if CONCURRENT_SEARCHES else "single-threaded"
+    print_info(f"Search mode: {mode}")
+    
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        for algo_name, params in algorithms:
+            print_info(f"\nTesting {algo_name.upper()}...")
+            
+            # Switch algorithm
+            request_data = {"algorithm": algo_name, **params}
+            response = SESSION.put(f"{BASE_URL}/config/algorithm", json=request_data)
+            assert response.status_code == 200, f"Failed to switch to {algo_name}"
+            
+            # Warm up, then time searches
+            with quiet_logging():
+                if CONCURRENT_SEARCHES:
+                    list(pool.map(timed_search, warmup_payloads))
+                    start = time.perf_counter()
+                    latencies = list(pool.map(timed_search, timed_payloads))
+                    elapsed = time.perf_counter() - start
+                else:
+                    for body in warmup_payloads:
+                        timed_search(body)
+                    start = time.perf_counter()
+                    latencies = [timed_search(body) for body in timed_payloads]
+                    elapsed = time.perf_counter() - start
+            
+            latencies_ms = [lat * 1000 for lat in latencies]
+            cuts = statistics.quantiles(latencies_ms, n=100)
+            avg_latency = sum(latencies_ms) / num_searches
+            throughput = num_searches / elapsed
+            results[algo_name] = {
+                "p50": cuts[49],
+                "p95": cuts[94],
+                "p99": cuts[98],
+                "mean": avg_latency,
+                "qps": throughput,
+            }
+            
+            print_info(f"  Average latency: {avg_latency:.2f}ms")
+            print_info(f"  Latency p50/p95/p99: {cuts[49]:.2f}/{cuts[94]:.2f}/{cuts[98]:.2f}ms")
+            print_info(f"  Throughput: {throughput:.0f} searches/sec")
     
     # Compare results
     print_info("\n📊 Performance Summary:")
-    baseline = results.get('exact', 1.0)
+    baseline = results.get('exact', {}).get("mean", 1.0)
     
-    for algo_name, latency in sorted(results.items(), key=lambda x: x[1]):
+    for algo_name, stats in sorted(results.items(), key=lambda x: x[1]["mean"]):
+        latency = stats["mean"]
         speedup = baseline / latency if latency > 0 else 1.0
-        print_info(f"  {algo_name.upper()}: {latency:.2f}ms (speedup: {speedup:.2f}x)")
-    
-    print_pass("Performance comparison completed")
-    return True
-
-def test_invalid_algorithm():
-    """Test error handling for invalid algorithm"""
-    print_test("Invalid Algorithm Error Handling")
-    
-    request_data = {
-        "algorithm": "invalid_algo"
-    }
-    
-    response = requests.put(
-        f"{BASE_URL}/config/algorithm",
-        json=request_data
-    )
-    
-    if response.status_code != 400:
-        print_fail(f"Expected 400, got {response.status_code}")
-        return False
-    
-    data = response.json()
-    print_info(f"Error response: {data['error']}")
-    
-    if 'error' not in data:
-        print_fail("Missing error message")
-        return False
-    
-    print_pass("Invalid algorithm rejected correctly")
-    return True
-
-def test_missing_algorithm_field():
-    """Test error handling for missing algorithm field"""
-    print_test("Missing Algorithm Field Error Handling")
-    
-    request_data = {
-        "num_tables": 10  # Missing 'algorithm' field
-    }
-    
-    response = requests.put(
-        f"{BASE_URL}/config/algorithm",
-        json=request_data
-    )
+        print_info(f"  {algo_name.upper()}: mean {latency:.2f}ms, "
+                   f"p50 {stats['p50']:.2f}ms, p95 {stats['p95']:.2f}ms, p99 {stats['p99']:.2f}ms, "
+                   f"{stats['qps']:.0f} qps (speedup: {speedup:.2f}x)")
     
-    if response.status_code != 400:
-        print_fail(f"Expected 400, got {response.status_code}")
-        return False
-    
-    data = response.json()
-    print_info(f"Error response: {data['error']}")
-    
-    if 'error' not in data:
-        print_fail("Missing error message")
-        return False
-    
-    print_pass("Missing field rejected correctly")
-    return True
+    if RUN_HNSW_SWEEP:
+        print_info(f"\n📈 HNSW parameter sweep ({SWEEP_QUERIES} queries, recall@10 vs brute force)...")
+        run_hnsw_sweep()
 
-def test_default_parameters():
-    """Test switching with default parameters"""
-    print_test("Default Parameters")
-    
-    # Switch to HNSW without specifying parameters
-    request_data = {
-        "algorithm": "hnsw"
-    }
-    
-    response = requests.put(
-        f"{BASE_URL}/config/algorithm",
-        json=request_data
-    )
-    
-    if response.status_code != 200:
-        print_fail(f"Status code: {response.status_code}")
-        return False
-    
-    data = response.json()
-    print_info(f"Default parameters: {data['parameters']}")
-    
-    # Check defaults are applied
-    if 'M' not in data['parameters']:
-        print_fail("Missing M parameter")
-        return False
-    
-    if 'ef_construction' not in data['parameters']:
-        print_fail("Missing ef_construction parameter")
-        return False
-    
-    print_pass(f"Default parameters applied: M={data['parameters']['M']}, ef_construction={data['parameters']['ef_construction']}")
-    return True
-
-def run_all_tests():
-    """Run all tests"""
-    print("\n" + "="*60)
-    print("VECTOR DATABASE - ALGORITHM SWITCHING API TESTS")
-    print("="*60)
-    
-    # Check server is running
-    try:
-        response = requests.get(f"{BASE_URL}/health")
-        if response.status_code != 200:
-            print_fail("Server is not healthy")
-            return
-    except requests.exceptions.ConnectionError:
-        print_fail(f"Cannot connect to server at {BASE_URL}")
-        print_info("Make sure the server is running:")
-        print_info("  cd /Users/habibrahman/Code/vector_database/build")
-        print_info("  ./vector_db_server")
-        return
-    
-    tests = [
-        test_get_algorithm_info,
-        test_switch_to_lsh,
-        test_switch_to_hnsw,
-        test_switch_to_exact,
-        test_default_parameters,
-        test_invalid_algorithm,
-        test_missing_algorithm_field,
-        test_performance_comparison,  # Last because it inserts many vectors
-    ]
-    
-    passed = 0
-    failed = 0
-    
-    for test in tests:
-        try:
-            if test():
-                passed += 1
-            else:
-                failed += 1
-        except Exception as e:
-            print_fail(f"Exception: {e}")
-            failed += 1
-    
-    # Summary
-    print("\n" + "="*60)
-    print("TEST SUMMARY")
-    print("="*60)
-    print(f"[PASS] Passed: {passed}/{len(tests)}")
-    print(f"[FAIL] Failed: {failed}/{len(tests)}")
-    
-    if failed == 0:
-        print("\n🎉 ALL TESTS PASSED!")
-        return 0
-    else:
-        print(f"\n  {failed} TEST(S) FAILED")
-        return 1
+def parse_args():
+    """Parse workload overrides; anything unrecognized is passed on to pytest"""
+    ap = argparse.ArgumentParser(description="Vector database algorithm switching API tests",
+                                 epilog="Other arguments (e.g. -n auto, -m slow) are forwarded to pytest.")
+    ap.add_argument("--n", type=int, default=NUM_VECTORS,
+                    help=f"vectors inserted for the performance comparison (default: {NUM_VECTORS})")
+    ap.add_argument("--dims", type=int, default=DIMENSIONS,
+                    help=f"vector dimensions, must match the server (default: {DIMENSIONS})")
+    ap.add_argument("--searches", type=int, default=NUM_SEARCHES,
+                    help=f"timed searches per algorithm, at least 2 (default: {NUM_SEARCHES})")
+    ap.add_argument("--batch", type=int, default=BATCH_SIZE,
+                    help=f"vectors per batch insert (default: {BATCH_SIZE})")
+    ap.add_argument("--algorithms", default=",".join(BENCH_ALGORITHMS),
+                    help="comma-separated algorithms to compare (default: %(default)s)")
+    ap.add_argument("--sequential", action="store_true",
+                    help="time searches one at a time instead of concurrently")
+    ap.add_argument("--no-sweep", action="store_true",
+                    help="skip the HNSW parameter sweep")
+    args, pytest_args = ap.parse_known_args()
+    
+    for flag, value, minimum in (("--n", args.n, 1), ("--dims", args.dims, 1),
+                                 ("--searches", args.searches, 2), ("--batch", args.batch, 1)):
+        if value < minimum:
+            ap.error(f"{flag} must be at least {minimum}")
+    args.algorithms = [a.strip() for a in args.algorithms.split(",") if a.strip()]
+    unknown = [a for a in args.algorithms if a not in ALGORITHM_PARAMS]
+    if unknown:
+        ap.error(f"unknown algorithm(s): {', '.join(unknown)}")
+    return args, pytest_args
 
 if __name__ == "__main__":
-    exit_code = run_all_tests()
-    sys.exit(exit_code)
+    args, pytest_args = parse_args()
+    # Handed over through the environment, which xdist workers inherit
+    os.environ.update({
+        "VDB_NUM_VECTORS": str(args.n),
+        "VDB_DIM": str(args.dims),
+        "VDB_NUM_QUERIES": str(args.searches),
+        "VDB_BATCH": str(args.batch),
+        "VDB_ALGORITHMS": ",".join(args.algorithms),
+        "VDB_SEQUENTIAL": "1" if args.sequential else "0",
+        "VDB_NO_SWEEP": "1" if args.no_sweep else "0",
+    })
+    sys.exit(pytest.main([__file__, "--tb=short", "-o", "log_cli=true", "-o", "log_cli_level=INFO",
+                          *pytest_args]))
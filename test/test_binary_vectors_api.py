@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for binary (base64 float32) vectors
+Tests the vector_b64 / query_b64 request fields and their validation
+
+Run with pytest:
+    pytest test/test_binary_vectors_api.py -v
+"""
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+import base64
+import os
+import random
+import socket
+import struct
+import sys
+from typing import List
+from urllib.parse import urlparse
+
+# Configuration
+BASE_URL = "http://localhost:8080"
+DIMENSIONS = int(os.environ.get("VDB_DIM", 128))
+
+# Shared keep-alive session: every call reuses pooled connections instead of
+# opening a new socket per request
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
+SESSION.headers["Content-Type"] = "application/json"
+
+# Seeded generator so every run exercises the same vectors
+_RNG = random.Random(0)
+
+def check_server():
+    """Check if server is running (plain TCP connect, no HTTP round trip)"""
+    url = urlparse(BASE_URL)
+    try:
+        socket.create_connection((url.hostname, url.port), timeout=0.5).close()
+        return True
+    except OSError:
+        return False
+
+def encode_float32(values: List[float]) -> str:
+    """Base64 of little-endian float32 values"""
+    return base64.b64encode(struct.pack(f"<{len(values)}f", *values)).decode()
+
+def as_float32(values: List[float]) -> List[float]:
+    """Round values to float32 precision"""
+    return list(struct.unpack(f"<{len(values)}f", struct.pack(f"<{len(values)}f", *values)))
+
+def setup_module(module):
+    """Skip unless the server is up and accepts binary vectors"""
+    if not check_server():
+        pytest.skip("Server is not running! Start it with: ./build/vector_db_server", allow_module_level=True)
+    features = SESSION.get(f"{BASE_URL}/health").json().get("features", [])
+    if "vector_b64" not in features:
+        pytest.skip("Server does not support base64 vectors", allow_module_level=True)
+
+def test_insert_roundtrip():
+    """A vector inserted via vector_b64 reads back unchanged"""
+    vector = as_float32([_RNG.uniform(-1.0, 1.0) for _ in range(DIMENSIONS)])
+    response = SESSION.post(
+        f"{BASE_URL}/vectors",
+        json={"key": "b64_roundtrip", "vector_b64": encode_float32(vector)}
+    )
+    assert response.status_code == 200, response.text
+
+    stored = SESSION.get(f"{BASE_URL}/vectors/b64_roundtrip").json()['vector']
+    assert as_float32(stored) == vector
+
+def test_search_query_b64():
+    """query_b64 finds the vector it encodes"""
+    vector = as_float32([_RNG.uniform(-1.0, 1.0) for _ in range(DIMENSIONS)])
+    response = SESSION.post(
+        f"{BASE_URL}/vectors",
+        json={"key": "b64_search", "vector_b64": encode_float32(vector)}
+    )
+    assert response.status_code == 200, response.text
+
+    response = SESSION.post(f"{BASE_URL}/search", json={"query_b64": encode_float32(vector), "k": 1})
+    assert response.status_code == 200, response.text
+    assert response.json()['results'][0]['key'] == "b64_search"
+
+@pytest.mark.parametrize("field, encoded", [
+    ("vector_b64", "not*base64"),                                   # malformed
+    ("vector_b64", encode_float32([0.5] * DIMENSIONS) + "=AAA"),      # data after padding
+    ("vector_b64", encode_float32([0.5] * DIMENSIONS) + "===="),      # excess padding
+    ("vector_b64", encode_float32([0.5] * (DIMENSIONS - 1))),         # wrong length
+    ("vector_b64", encode_float32([float("nan")] * DIMENSIONS)),      # non-finite
+    ("vector_b64", encode_float32([float("inf")] * DIMENSIONS)),
+    ("query_b64", encode_float32([float("nan")] * DIMENSIONS)),
+])
+def test_invalid_b64_rejected(field, encoded):
+    """Malformed, badly padded, wrong-length and non-finite binary vectors get a 400"""
+    if field == "vector_b64":
+        response = SESSION.post(f"{BASE_URL}/vectors", json={"key": "b64_invalid", field: encoded})
+    else:
+        response = SESSION.post(f"{BASE_URL}/search", json={field: encoded, "k": 1})
+    assert response.status_code == 400
+    assert 'error' in response.json()
+
+def test_invalid_batch_b64_rejected():
+    """vectors_b64 whose length doesn't match the keys gets a 400"""
+    response = SESSION.post(
+        f"{BASE_URL}/vectors/batch/insert",
+        json={"keys": ["b64_batch_0", "b64_batch_1"], "vectors_b64": encode_float32([0.5] * DIMENSIONS)}
+    )
+    assert response.status_code == 400
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -2,243 +2,162 @@
 """
 Test script for Distance Metrics API
 Tests switching between Euclidean, Manhattan, and Cosine distance metrics
+
+Run with pytest:
+    pytest test/test_distance_metrics_api.py -v
+
+The distance metric is server-wide state, so run this file in a single
+worker (no pytest-xdist -n) against a dedicated server.
 """
 
+import pytest
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import math
 import random
+import socket
+import sys
 from typing import List, Tuple
+from urllib.parse import urlparse
+
+try:
+    import numpy as np
+except ImportError:  # Pure-Python fallbacks are used below
+    np = None
 
 # Configuration
 BASE_URL = "http://localhost:8080"
 DIMENSIONS = 128
+METRICS = ["euclidean", "manhattan", "cosine"]
+QUERY_BODY = b""  # Pre-serialized search body, built in setup_module
+
+# Shared keep-alive session: every call reuses pooled connections instead of
+# opening a new socket per request
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0))
+SESSION.headers["Content-Type"] = "application/json"
+
+# Seeded generator so every run exercises the same vectors
+_RNG = np.random.default_rng(0) if np is not None else random.Random(0)
 
 def check_server():
-    """Check if server is running"""
+    """Check if server is running (plain TCP connect, no HTTP round trip)"""
+    url = urlparse(BASE_URL)
     try:
-        response = requests.get(f"{BASE_URL}/health")
-        return response.status_code == 200
-    except requests.exceptions.ConnectionError:
+        socket.create_connection((url.hostname, url.port), timeout=0.5).close()
+        return True
+    except OSError:
         return False
 
 def get_distance_metric():
     """Get current distance metric configuration"""
-    response = requests.get(f"{BASE_URL}/config/distance-metric")
+    response = SESSION.get(f"{BASE_URL}/config/distance-metric")
     response.raise_for_status()
     return response.json()
 
 def set_distance_metric(metric: str):
     """Set distance metric"""
-    response = requests.put(
+    response = SESSION.put(
         f"{BASE_URL}/config/distance-metric",
         json={"metric": metric}
     )
     response.raise_for_status()
     return response.json()
 
-def insert_vector(key: str, vector: List[float], metadata: str = ""):
-    """Insert a vector"""
-    response = requests.post(
-        f"{BASE_URL}/vectors",
-        json={"key": key, "vector": vector, "metadata": metadata}
-    )
-    return response.status_code == 200
-
-def search(query: List[float], k: int = 5):
-    """Perform similarity search"""
-    response = requests.post(
-        f"{BASE_URL}/search",
-        json={"query": query, "k": k}
-    )
+def search_body(body: bytes):
+    """Perform similarity search with a pre-serialized request body"""
+    response = SESSION.post(f"{BASE_URL}/search", data=body)
     response.raise_for_status()
     return response.json()
 
 def generate_random_vector(dimensions: int = DIMENSIONS) -> List[float]:
     """Generate a random vector"""
-    return [random.random() for _ in range(dimensions)]
+    if np is None:
+        return [_RNG.random() for _ in range(dimensions)]
+    return _RNG.random(dimensions, dtype=np.float32).tolist()
 
 def normalize_vector(vec: List[float]) -> List[float]:
     """Normalize a vector to unit length"""
-    magnitude = sum(x**2 for x in vec) ** 0.5
+    if np is None:
+        magnitude = math.sqrt(math.fsum(x * x for x in vec))
+        if magnitude == 0:
+            return vec
+        inv = 1.0 / magnitude
+        return [x * inv for x in vec]
+    
+    a = np.asarray(vec, dtype=np.float32)
+    magnitude = float(np.linalg.norm(a))
     if magnitude == 0:
         return vec
-    return [x / magnitude for x in vec]
+    return (a / magnitude).tolist()
 
-def main():
-    print("\n" + "="*70)
-    print("🎯 DISTANCE METRICS TEST SUITE")
-    print("="*70)
-    
-    # Check server
+def setup_module(module):
+    """Insert the shared test vectors once for all metric tests"""
+    global QUERY_BODY
     if not check_server():
-        print("[FAIL] Server is not running! Start it with: ./build/vector_db_server")
-        return
-    
-    print("[PASS] Server is running\n")
-    
-    # Get initial configuration
-    print("="*70)
-    print("📊 INITIAL CONFIGURATION")
-    print("="*70)
-    config = get_distance_metric()
-    print(f"Current metric: {config['current_metric']}")
-    print(f"\nAvailable metrics:")
-    for metric in config['available_metrics']:
-        simd_status = "[PASS] SIMD" if metric['simd_accelerated'] else "  Scalar"
-        print(f"  • {metric['name']:12} - {metric['description']}")
-        print(f"    {simd_status:12}   Use case: {metric['use_case']}")
-    
-    # Insert test vectors
-    print("\n" + "="*70)
-    print("📝 INSERTING TEST VECTORS")
-    print("="*70)
+        pytest.skip("Server is not running! Start it with: ./build/vector_db_server", allow_module_level=True)
     
     # Create distinct test vectors
     test_vectors = {
         "v1": [1.0] * DIMENSIONS,  # All ones
         "v2": [2.0] * DIMENSIONS,  # All twos
         "v3": [0.5] * DIMENSIONS,  # All 0.5
-        "v4": normalize_vector([random.random() for _ in range(DIMENSIONS)]),  # Random normalized
-        "v5": normalize_vector([random.random() for _ in range(DIMENSIONS)]),  # Random normalized
+        "v4": normalize_vector(generate_random_vector()),  # Random normalized
+        "v5": normalize_vector(generate_random_vector()),  # Random normalized
     }
     
-    for key, vector in test_vectors.items():
-        insert_vector(key, vector, f"test vector {key}")
-        print(f"  [PASS] Inserted {key}")
+    # One batch request; keys left over from an earlier run are skipped
+    response = SESSION.post(
+        f"{BASE_URL}/vectors/batch/insert",
+        json={
+            "keys": list(test_vectors),
+            "vectors": list(test_vectors.values()),
+            "metadata": [f"test vector {key}" for key in test_vectors]
+        }
+    )
+    assert response.status_code == 200, f"Batch insert failed: {response.text}"
     
     query = normalize_vector([1.5] * DIMENSIONS)  # Query vector
+    QUERY_BODY = json.dumps({"query": query, "k": 5}).encode()  # Reused for every metric
+
+def teardown_module(module):
+    """Restore the default metric"""
+    if check_server():
+        set_distance_metric("euclidean")
+
+def test_available_metrics():
+    """All supported metrics are advertised"""
+    config = get_distance_metric()
+    assert "current_metric" in config
     
-    # Test each distance metric
-    metrics = ["euclidean", "manhattan", "cosine"]
-    results = {}
-    
-    for metric in metrics:
-        print("\n" + "="*70)
-        print(f"🔍 TESTING: {metric.upper()} DISTANCE")
-        print("="*70)
-        
-        # Switch metric
-        response = set_distance_metric(metric)
-        print(f"[PASS] {response['message']}")
-        
-        # Perform search
-        search_results = search(query, k=5)
-        results[metric] = search_results['results']
-        
-        print(f"\nTop {len(search_results['results'])} results:")
-        for i, result in enumerate(search_results['results'], 1):
-            print(f"  {i}. {result['key']:8} - distance: {result['distance']:.6f}")
-    
-    # Compare results
-    print("\n" + "="*70)
-    print("📈 COMPARISON OF DISTANCE METRICS")
-    print("="*70)
-    
-    print("\nRankings by metric:")
-    print("-" * 70)
-    print(f"{'Rank':<6} {'Euclidean':<15} {'Manhattan':<15} {'Cosine':<15}")
-    print("-" * 70)
-    
-    max_rank = max(len(results[m]) for m in metrics)
-    for i in range(max_rank):
-        row = [str(i+1)]
-        for metric in metrics:
-            if i < len(results[metric]):
-                key = results[metric][i]['key']
-                dist = results[metric][i]['distance']
-                row.append(f"{key} ({dist:.4f})")
-            else:
-                row.append("-")
-        print(f"{row[0]:<6} {row[1]:<15} {row[2]:<15} {row[3]:<15}")
-    
-    # Analysis
-    print("\n" + "="*70)
-    print("🔬 ANALYSIS")
-    print("="*70)
-    
-    # Check if rankings differ
-    euclidean_order = [r['key'] for r in results['euclidean']]
-    manhattan_order = [r['key'] for r in results['manhattan']]
-    cosine_order = [r['key'] for r in results['cosine']]
-    
-    print(f"\n📊 Ranking Differences:")
-    print(f"  Euclidean vs Manhattan: {'Different [PASS]' if euclidean_order != manhattan_order else 'Same'}")
-    print(f"  Euclidean vs Cosine:    {'Different [PASS]' if euclidean_order != cosine_order else 'Same'}")
-    print(f"  Manhattan vs Cosine:    {'Different [PASS]' if manhattan_order != cosine_order else 'Same'}")
-    
-    print(f"\n💡 Observations:")
-    print(f"  • Cosine similarity is normalized - good for text embeddings")
-    print(f"  • Manhattan distance treats each dimension independently")
-    print(f"  • Euclidean distance is the most common general-purpose metric")
-    
-    # Test error handling
-    print("\n" + "="*70)
-    print("🧪 ERROR HANDLING TEST")
-    print("="*70)
-    
-    try:
-        response = requests.put(
-            f"{BASE_URL}/config/distance-metric",
-            json={"metric": "invalid_metric"}
-        )
-        if response.status_code == 400:
-            error_data = response.json()
-            print(f"[PASS] Correctly rejected invalid metric:")
-            print(f"   Error: {error_data['error']}")
-            print(f"   Available: {error_data.get('available_metrics', [])}")
-        else:
-            print(f"[FAIL] Expected 400 error, got {response.status_code}")
-    except Exception as e:
-        print(f"[FAIL] Error testing invalid metric: {e}")
-    
-    # Restore to Euclidean
-    print("\n" + "="*70)
-    print("🔄 RESTORING DEFAULT METRIC")
-    print("="*70)
-    response = set_distance_metric("euclidean")
-    print(f"[PASS] {response['message']}")
-    
-    # Final status
-    print("\n" + "="*70)
-    print("📊 FINAL STATUS")
-    print("="*70)
-    final_config = get_distance_metric()
-    print(f"Current metric: {final_config['current_metric']}")
-    
-    print("\n" + "="*70)
-    print("[PASS] ALL DISTANCE METRIC TESTS COMPLETED!")
-    print("="*70)
-    
-    # API Usage Examples
-    print("\n" + "="*70)
-    print("📚 API USAGE EXAMPLES")
-    print("="*70)
-    
-    print("\n# Check current distance metric:")
-    print(f"curl {BASE_URL}/config/distance-metric")
-    
-    print("\n# Switch to Manhattan distance:")
-    print(f"curl -X PUT {BASE_URL}/config/distance-metric \\")
-    print(f"  -H 'Content-Type: application/json' \\")
-    print(f"  -d '{{\"metric\": \"manhattan\"}}'")
-    
-    print("\n# Switch to Cosine similarity:")
-    print(f"curl -X PUT {BASE_URL}/config/distance-metric \\")
-    print(f"  -H 'Content-Type: application/json' \\")
-    print(f"  -d '{{\"metric\": \"cosine\"}}'")
-    
-    print("\n# Switch back to Euclidean:")
-    print(f"curl -X PUT {BASE_URL}/config/distance-metric \\")
-    print(f"  -H 'Content-Type: application/json' \\")
-    print(f"  -d '{{\"metric\": \"euclidean\"}}'")
-    
-    print()
+    names = [metric['name'] for metric in config['available_metrics']]
+    for metric in METRICS:
+        assert metric in names, f"{metric} missing from available metrics"
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_metric_rankings(metric):
+    """Switching metric takes effect and search results stay ordered"""
+    response = set_distance_metric(metric)
+    assert response['metric'] == metric, response.get('message')
+    
+    results = search_body(QUERY_BODY)['results']
+    print(f"\n{metric} top {len(results)}:")
+    for i, result in enumerate(results, 1):
+        print(f"  {i}. {result['key']:8} - distance: {result['distance']:.6f}")
+    
+    assert len(results) == 5
+    distances = [r['distance'] for r in results]
+    assert distances == sorted(distances), f"{metric} distances are not non-decreasing"
+
+def test_invalid_metric():
+    """Unknown metrics are rejected with 400"""
+    response = SESSION.put(
+        f"{BASE_URL}/config/distance-metric",
+        json={"metric": "invalid_metric"}
+    )
+    assert response.status_code == 400
+    assert 'error' in response.json()
 
 if __name__ == "__main__":
-    try:
-        main()
-    except Exception as e:
-        print(f"\n[FAIL] Error: {e}")
-        import traceback
-        traceback.print_exc()
-        exit(1)
+    sys.exit(pytest.main([__file__, "-v"]))